@@ -1,31 +1,69 @@
 from machine import unique_id
 import socket
 import ssl
+import ubinascii as binascii
 import ujson as json
+from micropython import const
+
+# Diagnostic prints (set to 0 for production builds)
+_DBG = const(1)
+
+class Config:
+    """Configuration values, accessed as attributes (e.g. config.ntrip_server)"""
+    # No other methods: server-supplied keys share this namespace (a key "items" would shadow one)
+    
+    def __init__(self, **values):
+        _apply(self, values)
+
+def _apply(cfg, values):
+    """Set every key of the dict values as an attribute of cfg"""
+    for key, value in values.items():
+        setattr(cfg, key, value)
 
 # Global configuration variables
-config = {
-    'loaded': False,
-    'base_mode': 'time',
-    'base_duration': 60,
-    'base_pdop': 1,
-    'signal_group': 2,
-    'sbas_enabled': True,
-    'rtcm_interval': 1,
-    'ntrip_server': "crtk.net",
-    'ntrip_port': 2101,
-    'ntrip_mountpoint': None,
-    'ntrip_user': None,
-    'ntrip_password': None,
-}
+config = Config(
+    loaded=False,
+    base_mode='time',
+    base_duration=60,
+    base_pdop=1,
+    signal_group=2,
+    sbas_enabled=True,
+    rtcm_interval=1,
+    ntrip_server="crtk.net",
+    ntrip_port=2101,
+    ntrip_mountpoint=None,
+    ntrip_user=None,
+    ntrip_password=None,
+)
+
+# DNS cache: (host, port) -> getaddrinfo() entry
+_dns_cache = {}
+
+# TLS client context, created on first HTTPS download
+_tls_ctx = None
+
+def _get_tls_ctx():
+    """Return the shared TLS client context (no certificate verification)"""
+    global _tls_ctx
+    if _tls_ctx is None:
+        _tls_ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        _tls_ctx.check_hostname = False
+        _tls_ctx.verify_mode = ssl.CERT_NONE
+    return _tls_ctx
 
 def get_hardware_id():
     """
     Get unique hardware ID for W55RP20
     Returns hex string of the unique ID
     """
-    uid = unique_id()
-    return ''.join('{:02x}'.format(b) for b in uid)
+    return binascii.hexlify(unique_id()).decode()
+
+def _close(s):
+    """Close a socket, ignoring errors"""
+    try:
+        s.close()
+    except OSError:
+        pass
 
 def download_config(server_url, timeout=10):
     """
@@ -39,53 +77,53 @@ def download_config(server_url, timeout=10):
     Returns:
         bool: True if config loaded successfully, False otherwise
     """
-    global config
-    
     hw_id = get_hardware_id()
     
     print(f"\n=== Downloading Configuration ===")
     print(f"Hardware ID: {hw_id}")
     
+    s = None
     try:
         # Parse URL
-        if server_url.startswith('https://'):
+        scheme, _, rest = server_url.partition('://')
+        if scheme == 'https':
             use_ssl = True
-            host = server_url[8:]  # Remove 'https://'
             port = 443
-        elif server_url.startswith('http://'):
+        elif scheme == 'http':
             use_ssl = False
-            host = server_url[7:]  # Remove 'http://'
             port = 80
         else:
             print("ERROR: URL must start with http:// or https://")
             return False
         
         # Remove trailing slash and extract path if present
-        if '/' in host:
-            host, path_prefix = host.split('/', 1)
+        host, _, path_prefix = rest.partition('/')
+        path_prefix = path_prefix.rstrip('/')
+        if path_prefix:
             path_prefix = '/' + path_prefix
-        else:
-            path_prefix = ''
         
         # Handle port in host
-        if ':' in host:
-            host, port_str = host.split(':', 1)
+        host, sep, port_str = host.partition(':')
+        if sep:
             port = int(port_str)
         
         path = f"{path_prefix}/config.json?b={hw_id}"
         
-        print(f"Host: {host}")
-        print(f"Port: {port}")
-        print(f"Path: {path}")
-        print(f"SSL: {use_ssl}")
+        if _DBG:
+            print(f"Host: {host}")
+            print(f"Port: {port}")
+            print(f"Path: {path}")
+            print(f"SSL: {use_ssl}")
         
-        # Lookup server address
-        try:
-            ai = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
-        except Exception as e:
-            print(f"ERROR: DNS lookup failed: {e}")
-            return False
-        ai = ai[0]
+        # Lookup server address (cached for repeated downloads)
+        ai = _dns_cache.get((host, port))
+        if ai is None:
+            try:
+                ai = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0]
+            except Exception as e:
+                print(f"ERROR: DNS lookup failed: {e}")
+                return False
+            _dns_cache[(host, port)] = ai
         
         # Create socket
         s = socket.socket(ai[0], ai[1], ai[2])
@@ -93,87 +131,119 @@ def download_config(server_url, timeout=10):
         
         # Connect
         addr = ai[-1]
-        print(f"Connecting to: {addr}")
+        if _DBG:
+            print(f"Connecting to: {addr}")
         s.connect(addr)
         
         # Upgrade to TLS if HTTPS
         if use_ssl:
-            print("Upgrading to TLS...")
-            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
-            ctx.check_hostname = False
-            ctx.verify_mode = ssl.CERT_NONE
-            s = ctx.wrap_socket(s)
+            if _DBG:
+                print("Upgrading to TLS...")
+            s = _get_tls_ctx().wrap_socket(s)
         
         # Send HTTP request
         request = f"GET {path} HTTP/1.0\r\nHost: {host}\r\n\r\n"
         s.write(request.encode())
         
-        # Read response
-        response = b''
-        while True:
+        # Read until the end of the headers
+        buf = bytearray()
+        hdr_end = -1
+        while hdr_end < 0:
             try:
-                chunk = s.read(512)
-                if not chunk:
-                    break
-                response += chunk
-            except:
+                chunk = s.read(4096)
+            except OSError:
+                chunk = None
+            if not chunk:
                 break
+            buf.extend(chunk)
+            if b'\r\n\r\n' in buf:
+                # MicroPython's bytearray supports 'in' but not find()
+                hdr_end = bytes(buf).find(b'\r\n\r\n')
         
-        try:
-            s.close()
-        except:
-            pass
-        
-        # Parse HTTP response
-        response_str = response.decode('utf-8', 'ignore')
-        
-        # Split headers and body
-        if '\r\n\r\n' not in response_str:
+        if hdr_end < 0:
+            _close(s)
             print("ERROR: Invalid HTTP response")
             return False
         
-        headers, body = response_str.split('\r\n\r\n', 1)
+        headers = bytes(buf[:hdr_end]).split(b'\r\n')
+        hdr_end += 4
         
-        # Check status code
-        status_line = headers.split('\r\n')[0]
-        if '200' not in status_line:
-            print(f"ERROR: HTTP {status_line}")
+        # Check status code (on bytes; decoded only for the error message)
+        status_line = headers[0]
+        if status_line.split(b' ', 2)[1:2] != [b'200']:
+            _close(s)
+            print(f"ERROR: HTTP {status_line.decode('utf-8', 'ignore')}")
             return False
         
         print("✓ HTTP 200 OK")
         
+        # Find body length
+        content_length = -1
+        for line in headers[1:]:
+            name, _, value = line.partition(b':')
+            if name.strip().lower() == b'content-length':
+                content_length = int(value)
+                break
+        
+        # Read body straight into a pre-sized buffer
+        if content_length < 0:
+            # No Content-Length: read until the server closes
+            body = buf[hdr_end:]
+            while True:
+                try:
+                    chunk = s.read(4096)
+                except OSError:
+                    break
+                if not chunk:
+                    break
+                body.extend(chunk)
+        else:
+            body = bytearray(content_length)
+            mv = memoryview(body)
+            off = min(len(buf) - hdr_end, content_length)
+            mv[:off] = buf[hdr_end:hdr_end + off]
+            while off < content_length:
+                n = s.readinto(mv[off:])
+                if not n:
+                    break
+                off += n
+            if off < content_length:
+                _close(s)
+                print(f"ERROR: Truncated body ({off}/{content_length} bytes)")
+                return False
+        
+        _close(s)
+        buf = None
+        
         # Parse JSON body
         server_config = json.loads(body)
         
         print(f"Received config: {len(server_config)} settings")
         
         # Update global config with server values
-        for key, value in server_config.items():
-            if key in config:
-                old_value = config[key]
-                config[key] = value
-                print(f"  {key}: {old_value} -> {value}")
-            else:
-                config[key] = value
-                print(f"  {key}: {value} (new)")
-        
-        config['loaded'] = True
+        if _DBG:
+            for key, value in server_config.items():
+                if hasattr(config, key):
+                    print(f"  {key}: {getattr(config, key)} -> {value}")
+                else:
+                    print(f"  {key}: {value} (new)")
+        _apply(config, server_config)
+        config.loaded = True
         print("✓ Configuration loaded successfully")
         return True
         
     except Exception as e:
         print(f"ERROR downloading config: {e}")
-        if 's' in locals():
-            try:
-                s.close()
-            except:
-                pass
+        # Drop cached addresses so the next attempt resolves again
+        _dns_cache.clear()
+        if s is not None:
+            _close(s)
         return False
 
 def print_config():
     """Print current configuration"""
     print("\n=== Current Configuration ===")
-    for key, value in config.items():
+    for key, value in config.__dict__.items():
         print(f"  {key}: {value}")
 
 # Usage
@@ -92,19 +92,19 @@ def main():
     # ===================================================================
     print("\n[STEP 4] Starting NTRIP Caster Thread...")
     
-    if not all([config['ntrip_server'], config['ntrip_mountpoint'], 
-                config['ntrip_user'], config['ntrip_password']]):
+    if not all([config.ntrip_server, config.ntrip_mountpoint, 
+                config.ntrip_user, config.ntrip_password]):
         print("✗ Missing NTRIP configuration")
         print("  Please configure: ntrip_server, ntrip_mountpoint, ntrip_user, ntrip_password")
         print("\n  Skipping NTRIP - continuing without caster connection")
         ntrip = None
     else:
         ntrip = NTRIPCaster(
-            server=config['ntrip_server'],
-            port=int(config['ntrip_port']),
-            mountpoint=config['ntrip_mountpoint'],
-            username=config['ntrip_user'],
-            password=config['ntrip_password']
+            server=config.ntrip_server,
+            port=int(config.ntrip_port),
+            mountpoint=config.ntrip_mountpoint,
+            username=config.ntrip_user,
+            password=config.ntrip_password
         )
         
         # Start NTRIP on core 1
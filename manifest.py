@@ -0,0 +1,13 @@
+# Freeze the base station modules into the firmware (bytecode and constant
+# tables such as RTCM_MESSAGES then live in flash instead of RAM):
+#   make BOARD=<your board> FROZEN_MANIFEST=/path/to/uPyRTKBase/manifest.py
+# main.py stays on the filesystem so it can be edited on the device.
+include("$(PORT_DIR)/boards/manifest.py")
+
+module("config_manager.py")
+module("network_init.py")
+module("ntrip_caster.py")
+module("rtcm_decoder.py")
+module("rtcm_params.py")
+module("um980_config.py")
+module("wiznet_init.py", opt=3)
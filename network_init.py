@@ -1,6 +1,9 @@
-from wiznet_init import wiznet
-import time
+from wiznet_init import wiznet, wiznet_status
 import gc
+from micropython import const
+
+# Diagnostic prints (set to 0 for production builds)
+_DBG = const(1)
 
 # Global network interface
 nic = None
@@ -33,36 +36,29 @@ def w5x00_init(board="W55RP20-EVB-Pico", use_dhcp=True, static_ip=None, subnet=N
     gc.collect()
     
     print("\n=== Initializing W5x00 Ethernet ===")
-    print(f"Board: {board}")
+    if _DBG:
+        print(f"Board: {board}")
+    
+    # wiznet() waits for the link itself and raises OSError once this many seconds have passed
+    timeout = 120
     
     try:
         if use_dhcp:
             print("Using DHCP...")
-            nic = wiznet(board, dhcp=True)
+            nic = wiznet(board, dhcp=True, dhcp_timeout=timeout)
         else:
             if not all([static_ip, subnet, gateway, dns]):
                 print("✗ Missing static IP configuration")
                 return None
             print(f"Using static IP: {static_ip}")
-            nic = wiznet(board, dhcp=False, ip=static_ip, sn=subnet, gw=gateway, dns=dns)
+            nic = wiznet(board, dhcp=False, ip=static_ip, sn=subnet, gw=gateway, dns=dns, dhcp_timeout=timeout)
         
         if nic is None:
             print("✗ Failed to initialize network interface")
             return None
         
-        print(f"IP address: {nic.ifconfig()}")
-        
-        # Wait for connection
-        print("Waiting for Ethernet connection", end='')
-        timeout = 120
-        start = time.time()
-        while not nic.isconnected():
-            if time.time() - start > timeout:
-                print("\n✗ Ethernet connection timeout")
-                nic = None
-                return None
-            time.sleep(0.5)
-            print(".", end='')
+        if _DBG:
+            print(f"IP address: {nic.ifconfig()}")
         
         print("\n✓ Ethernet connected")
         print(f"Network config: {nic.ifconfig()}")
@@ -73,16 +69,14 @@ def w5x00_init(board="W55RP20-EVB-Pico", use_dhcp=True, static_ip=None, subnet=N
         return None
 
 def get_network_status():
-    """Get current network status"""
-    global nic
-    
+    """Get current network status (addresses cached by wiznet_status() for 1 s)"""
     if nic is None:
         return {'connected': False, 'ip': None}
     
     try:
         is_connected = nic.isconnected()
         if is_connected:
-            ifconfig = nic.ifconfig()
+            ifconfig = wiznet_status(nic)
             return {
                 'connected': True,
                 'ip': ifconfig[0],
@@ -93,7 +87,8 @@ def get_network_status():
         else:
             return {'connected': False, 'ip': None, 'subnet': None, 'gateway': None, 'dns': None}
     except Exception as e:
-        print(f"Warning: Error getting network status: {e}")
+        if _DBG:
+            print(f"Warning: Error getting network status: {e}")
         return {'connected': False, 'ip': None}
 
 def print_network_status():
@@ -1,11 +1,31 @@
 import usocket as socket
 import time
+import uerrno as errno
 import _thread
 import ubinascii as binascii
 import gc
+from micropython import const
 from machine import WDT
+from um980_config import uart_poller
 wdt = WDT(timeout=8000)
 
+# Diagnostic prints (set to 0 for production builds)
+_DBG = const(1)
+# Per-packet logging on the forwarding path (set to 1 to enable)
+_LOG = const(0)
+# Packets between two "Sent" log lines
+_LOG_EVERY = const(128)
+# Size of the reusable UART -> socket forwarding buffer
+_BUF_SIZE = const(1024)
+# Transient send errors tolerated before the connection is dropped
+_SEND_RETRIES = const(50)
+# Dwell after a UART read to batch adjacent RTCM frames into one send
+_COALESCE_MS = const(2)
+# Delay between two connection attempts
+_RETRY_MS = const(7000)
+# Send errors that mean the TCP session is gone (32 = EPIPE, not exported by uerrno)
+_FATAL_ERRNOS = (errno.ECONNRESET, errno.ECONNABORTED, errno.ENOTCONN, 32)
+
 class NTRIPCaster:
     """NTRIP Caster client for sending RTCM data from base station"""
     
@@ -26,76 +46,86 @@ class NTRIPCaster:
         self.username = username
         self.password = password
         self.socket = None
+        self._addr = None  # Resolved caster address, reused across reconnects
         self.connected = False
         self.running = False
-        
-    def _base64_encode(self, user, pwd):
-        """Encode username:password in base64 for HTTP Basic Auth"""
-        credentials = f"{user}:{pwd}"
-        encoded = binascii.b2a_base64(credentials.encode()).decode().strip()
-        return encoded
+        self._log_ctr = 0
+        self._buf = bytearray(_BUF_SIZE)
+        self._mv = memoryview(self._buf)
+        # Credentials never change, so the request is built once
+        self._request_bytes = self._build_source_request()
     
     def _build_source_request(self):
-        """Build NTRIP source table request (HTTP POST for base station)"""
-        request = (
-            f"POST /{self.mountpoint} HTTP/1.1\r\n"
-            f"Host: {self.server}\r\n"
-            f"Ntrip-Version: Ntrip/2.0\r\n"
-            f"User-Agent: NTRIP MicroPython Base\r\n"
+        """Build NTRIP source table request (HTTP POST for base station) as bytes"""
+        auth = binascii.b2a_base64(f"{self.username}:{self.password}".encode()).rstrip()
+        return (
+            b"POST /" + str(self.mountpoint).encode() + b" HTTP/1.1\r\n"
+            b"Host: " + str(self.server).encode() + b"\r\n"
+            b"Ntrip-Version: Ntrip/2.0\r\n"
+            b"User-Agent: NTRIP MicroPython Base\r\n"
+            b"Authorization: Basic " + auth + b"\r\n"
+            b"Connection: close\r\n\r\n"
         )
-        
-        # Add authentication
-        auth = self._base64_encode(self.username, self.password)
-        request += f"Authorization: Basic {auth}\r\n"
-        
-        request += "Connection: close\r\n\r\n"
-        return request
     
     def connect(self):
         """Connect to NTRIP caster"""
         print(f"\n=== Connecting to NTRIP Caster ===")
-        print(f"Server: {self.server}:{self.port}")
-        print(f"Mountpoint: {self.mountpoint}")
+        if _DBG:
+            print(f"Server: {self.server}:{self.port}")
+            print(f"Mountpoint: {self.mountpoint}")
         
+        result = False
         try:
             # Create socket
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.socket.settimeout(10)
             
-            # Resolve hostname and connect
-            addr_info = socket.getaddrinfo(self.server, self.port)[0]
-            addr = addr_info[-1]
-            print(f"Resolved to: {addr}")
+            # Resolve hostname (once, cached across reconnects) and connect
+            if self._addr is None:
+                self._addr = socket.getaddrinfo(self.server, self.port)[0][-1]
+                if _DBG:
+                    print(f"Resolved to: {self._addr}")
             
-            self.socket.connect(addr)
+            self.socket.connect(self._addr)
             print("✓ TCP connection established")
             
+            # Keep the session alive through idle RTCM periods (if supported)
+            try:
+                self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            except (AttributeError, OSError):
+                pass
+            # Send small RTCM frames immediately instead of Nagle-batching them
+            try:
+                self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except (AttributeError, OSError):
+                pass
+            
             # Send NTRIP request
-            request = self._build_source_request()
-            print("\nSending request:")
-            print(request[:200] + "...")
+            if _LOG:
+                print("\nSending request:")
+                print(self._request_bytes[:200].decode() + "...")
             
-            self.socket.send(request.encode())
+            self.socket.send(self._request_bytes)
             
             # Wait for response
-            response = b''
+            response = bytearray()
             start = time.time()
             while time.time() - start < 5:
                 try:
-                    chunk = self.socket.recv(512)
+                    chunk = self.socket.recv(2048)
                     if chunk:
-                        response += chunk
+                        response.extend(chunk)
                         if b'\r\n\r\n' in response:
                             break
                 except:
                     break
             
-            response_str = response.decode('utf-8', 'ignore')
-            print("\nReceived response:")
-            print(response_str[:200])
+            if _LOG:
+                print("\nReceived response:")
+                print(bytes(response[:200]).decode('utf-8', 'ignore'))
             
             # Check for success
-            if 'ICY 200 OK' in response_str or 'HTTP/1.1 200 OK' in response_str:
+            if b'ICY 200 OK' in response or b'HTTP/1.1 200 OK' in response:
                 print("\n✓ Connected to NTRIP caster successfully")
                 self.connected = True
                 # Set socket to non-blocking for production use
@@ -103,40 +133,37 @@ class NTRIPCaster:
                     self.socket.setblocking(False)
                 except:
                     pass
-                return True
-            elif 'HTTP/1.1 409' in response_str or 'HTTP/1.0 409' in response_str:
+                result = True
+            elif b'HTTP/1.1 409' in response or b'HTTP/1.0 409' in response:
                 print(f"\n⚠ HTTP 409 Conflict - Mountpoint already in use")
-                try:
-                    self.socket.close()
-                except:
-                    pass
-                self.socket = None
-                return 'retry'
+                result = 'retry'
             else:
-                print(f"\n✗ Connection failed: {response_str[:100]}")
-                try:
-                    self.socket.close()
-                except:
-                    pass
-                self.socket = None
-                return False
+                print(f"\n✗ Connection failed: {bytes(response[:100]).decode('utf-8', 'ignore')}")
                 
         except Exception as e:
             print(f"\n✗ Connection error: {e}")
-            if self.socket:
-                try:
-                    self.socket.close()
-                except:
-                    pass
-                self.socket = None
-            return False
+            # Resolve again on the next attempt in case the caster IP changed
+            self._addr = None
+        finally:
+            if result is not True:
+                self._close_socket()
+        return result
+    
+    def _close_socket(self):
+        """Close and forget the caster socket, if any"""
+        if self.socket is not None:
+            try:
+                self.socket.close()
+            except OSError:
+                pass
+            self.socket = None
     
     def send_rtcm(self, data):
         """
         Send RTCM data to caster
         
         Args:
-            data: bytes object containing RTCM frame(s)
+            data: bytes or memoryview containing RTCM frame(s)
         
         Returns:
             bool: True if sent successfully
@@ -145,39 +172,61 @@ class NTRIPCaster:
             return False
         
         try:
-            # self.socket.send(data)
             total_sent = 0
+            retries = 0
             while total_sent < len(data):
                 try:
                     sent = self.socket.send(data[total_sent:])
                     if sent == 0:
-                        raise OSError("Socket connection broken")
+                        raise OSError(errno.ENOTCONN)
                     total_sent += sent
                 except OSError as e:
+                    err = e.args[0]
                     # EAGAIN/EWOULDBLOCK - socket buffer full, wait a bit
-                    if e.args[0] == 11:  # EAGAIN
+                    if err == errno.EAGAIN:
                         time.sleep(0.01)
                         continue
-                    else:
-                        raise  
+                    # Connection is gone, or a transient error that won't clear
+                    if err in _FATAL_ERRNOS or retries >= _SEND_RETRIES:
+                        raise
+                    # Transient error: keep the connection and retry
+                    retries += 1
+                    time.sleep(0.01)
             return True
         except Exception as e:
-            print(f"Error sending RTCM: {e}")
+            if _DBG:
+                self._log_send_error(e)
             self.connected = False
+            self._close_socket()
             return False
     
+    def _log_send_error(self, e):
+        """Report a send failure (kept out of send_rtcm so the f-string is only built on error)"""
+        print(f"Error sending RTCM: {e}")
+    
     def disconnect(self):
         """Disconnect from caster"""
         self.running = False
         self.connected = False
-        if self.socket:
-            try:
-                self.socket.close()
-            except:
-                pass
-            self.socket = None
+        self._close_socket()
         print("Disconnected from NTRIP caster")
     
+    def _wait(self, data_uart, ms):
+        """
+        Wait between connection attempts without blocking shutdown
+        
+        Stale RTCM is drained from the UART meanwhile so its FIFO doesn't overflow.
+        
+        Returns:
+            bool: False if the client was stopped while waiting
+        """
+        deadline = time.ticks_add(time.ticks_ms(), ms)
+        while self.running and time.ticks_diff(deadline, time.ticks_ms()) > 0:
+            if data_uart.any():
+                data_uart.readinto(self._buf)  # drop stale RTCM
+            time.sleep_ms(200)
+        return self.running
+    
     def run_threaded(self, data_uart):
         """
         Run NTRIP client on separate thread
@@ -188,6 +237,7 @@ class NTRIPCaster:
         """
         print("\n=== Starting NTRIP Thread ===")
         
+        self.running = True
         max_connect_attempts = 120
         connect_attempt = 0
         
@@ -204,17 +254,18 @@ class NTRIPCaster:
                 break
             elif result == 'retry':
                 print("Waiting 7 seconds before retry...")
-                time.sleep(7)
             else:
                 print(f"Retrying in 7 seconds... (attempt {connect_attempt}/{max_connect_attempts})")
-                time.sleep(7)
+            if not self._wait(data_uart, _RETRY_MS):
+                return
         
-        self.running = True
         bytes_sent = 0
         BYTES_COUNTER_MAX = 1000000  # Reset counter at 1MB to prevent overflow
         last_gc_time = time.ticks_ms()
         GC_INTERVAL_MS = 300000  # Run GC every 5 minutes
         
+        poller = uart_poller(data_uart)
+        
         try:
             while self.running:
                 # Periodic garbage collection
@@ -222,14 +273,23 @@ class NTRIPCaster:
                     gc.collect()
                     last_gc_time = time.ticks_ms()
                 # Read RTCM data from UART
-                if data_uart.any():
-                    data = data_uart.read(min(data_uart.any(),2048))
-                    if data:
-                        if self.send_rtcm(data):
-                            bytes_sent = (bytes_sent + len(data)) % BYTES_COUNTER_MAX
-                            if bytes_sent < 1000:
-                                print(f"Sent {bytes_sent} bytes to caster")
-                                bytes_sent = 0
+                n = data_uart.any()
+                if n:
+                    n = data_uart.readinto(self._mv[:min(n, _BUF_SIZE)])
+                    if n:
+                        if n < _BUF_SIZE:
+                            # Give adjacent frames a moment to arrive and send them together
+                            time.sleep_ms(_COALESCE_MS)
+                            m = data_uart.any()
+                            if m:
+                                n += data_uart.readinto(self._mv[n:n + min(m, _BUF_SIZE - n)]) or 0
+                        if self.send_rtcm(self._mv[:n]):
+                            if _LOG:
+                                bytes_sent = (bytes_sent + n) % BYTES_COUNTER_MAX
+                                self._log_ctr += 1
+                                if self._log_ctr >= _LOG_EVERY:
+                                    print(f"Sent {bytes_sent} bytes to caster")
+                                    self._log_ctr = 0
                         else:
                             print("Connection lost, reconnecting...")
                             reconnect_attempt = 0
@@ -247,11 +307,14 @@ class NTRIPCaster:
                                     break
                                 elif result == 'retry':
                                     print(f"Reconnection failed, retrying in 7s... (attempt {reconnect_attempt}/{max_reconnect_attempts})")
-                                    time.sleep(7)
                                 else:
                                     print("Reconnection failed, retrying in 7s...")
-                                    time.sleep(7)
-                time.sleep(0.01)
+                                if not self._wait(data_uart, _RETRY_MS):
+                                    return
+                if poller:
+                    poller.poll(1000)
+                else:
+                    time.sleep(0.01)
                 
         except KeyboardInterrupt:
             print("\nStopped by user")
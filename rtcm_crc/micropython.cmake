@@ -0,0 +1,11 @@
+add_library(usermod_rtcm_crc INTERFACE)
+
+target_sources(usermod_rtcm_crc INTERFACE
+    ${CMAKE_CURRENT_LIST_DIR}/rtcm_crc.c
+)
+
+target_include_directories(usermod_rtcm_crc INTERFACE
+    ${CMAKE_CURRENT_LIST_DIR}
+)
+
+target_link_libraries(usermod INTERFACE usermod_rtcm_crc)
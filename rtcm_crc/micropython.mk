@@ -0,0 +1,4 @@
+RTCM_CRC_MOD_DIR := $(USERMOD_DIR)
+
+SRC_USERMOD += $(RTCM_CRC_MOD_DIR)/rtcm_crc.c
+CFLAGS_USERMOD += -I$(RTCM_CRC_MOD_DIR)
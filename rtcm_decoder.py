@@ -1,3 +1,108 @@
+import array
+import struct
+
+
+def _crc24q_bitwise(data):
+    """
+    Calculate CRC24Q bit by bit (only used to build the lookup table)
+    Polynomial: 0x1864CFB
+    """
+    crc = 0
+    for byte in data:
+        crc ^= (byte << 16)
+        for _ in range(8):
+            crc <<= 1
+            if crc & 0x1000000:
+                crc ^= 0x1864CFB
+    return crc & 0xFFFFFF
+
+
+def _crc24q_shift_table(table):
+    """Advance every entry of a CRC24Q table by one zero byte"""
+    base = _CRC24Q_TABLE
+    return array.array('I', [((v << 8) ^ base[v >> 16]) & 0xFFFFFF for v in table])
+
+
+def _crc24q_py(data, n):
+    """
+    Calculate CRC24Q over the first n bytes of data
+    Slicing-by-4 with a byte-wise tail (pure Python fallback)
+    """
+    t0 = _CRC24Q_TABLE
+    t1 = _CRC24Q_T1
+    t2 = _CRC24Q_T2
+    t3 = _CRC24Q_T3
+    crc = 0
+    end = n & ~3
+    i = 0
+    while i < end:
+        crc = (t3[((crc >> 16) ^ data[i]) & 0xFF] ^
+               t2[((crc >> 8) ^ data[i + 1]) & 0xFF] ^
+               t1[(crc ^ data[i + 2]) & 0xFF] ^
+               t0[data[i + 3]])
+        i += 4
+    while i < n:
+        crc = ((crc << 8) ^ t0[((crc >> 16) ^ data[i]) & 0xFF]) & 0xFFFFFF
+        i += 1
+    return crc
+
+
+# One guard for the Viper functions below: they are only defined on MicroPython
+try:
+    import micropython
+except ImportError:
+    micropython = None
+
+
+# Lookup tables are only built for the implementation that uses them
+try:
+    # C implementation frozen into the firmware (see rtcm_crc/), carries its own table
+    from rtcm_crc import crc24q as _crc24q_fast
+except ImportError:
+    # CRC24Q of every single byte value, for the byte-at-a-time (Sarwate) algorithm
+    _CRC24Q_TABLE = array.array('I', [_crc24q_bitwise((i,)) for i in range(256)])
+    if micropython:
+        @micropython.viper
+        def _crc24q_fast(data: ptr8, n: int) -> int:
+            """Calculate CRC24Q over the first n bytes of data (native code)"""
+            table = ptr32(_CRC24Q_TABLE)
+            crc = 0
+            for i in range(n):
+                crc = ((crc << 8) ^ table[((crc >> 16) ^ data[i]) & 0xFF]) & 0xFFFFFF
+            return crc
+    else:
+        # Slicing-by-4: the same table followed by 1, 2 and 3 zero bytes
+        # processes 4 bytes per step
+        _CRC24Q_T1 = _crc24q_shift_table(_CRC24Q_TABLE)
+        _CRC24Q_T2 = _crc24q_shift_table(_CRC24Q_T1)
+        _CRC24Q_T3 = _crc24q_shift_table(_CRC24Q_T2)
+        _crc24q_fast = _crc24q_py
+
+
+if hasattr(bytearray, 'find'):
+    def _find_preamble(buf, start, end):
+        """Index of the first RTCM3 preamble (0xD3) in buf[start:end], or -1"""
+        return buf.find(b'\xd3', start, end)
+else:
+    # MicroPython's bytearray has no find(): scan in native code instead
+    @micropython.viper
+    def _find_preamble(buf: ptr8, start: int, end: int) -> int:
+        """Index of the first RTCM3 preamble (0xD3) in buf[start:end], or -1"""
+        i = start
+        while i < end:
+            if buf[i] == 0xD3:
+                return i
+            i += 1
+        return -1
+
+
+# Compact the buffer once this many consumed bytes sit in front of the read cursor
+_COMPACT_AT = 4096
+
+# Default for RTCMDecoder(on_message=...): distinct from None, which disables the callback
+_PRINT = object()
+
+
 class RTCMDecoder:
     """
     Lightweight RTCM3 message decoder for embedded systems
@@ -23,11 +128,40 @@ class RTCMDecoder:
         1127: "BeiDou MSM7",
     }
     
-    def __init__(self, debug_crc=False):
+    # Which fields to extract, by message type
+    _MSG_KIND = {
+        1001: 'station', 1002: 'station', 1003: 'station', 1004: 'station',  # GPS observables
+        1005: 'station', 1006: 'station',  # Station position
+        1009: 'station', 1010: 'station', 1011: 'station', 1012: 'station',  # GLONASS observables
+        1019: 'ephem', 1020: 'ephem', 1042: 'ephem', 1044: 'ephem', 1045: 'ephem', 1046: 'ephem',
+        1077: 'msm7', 1087: 'msm7', 1097: 'msm7', 1107: 'msm7', 1117: 'msm7', 1127: 'msm7',
+    }
+    
+    # Constellation names by ephemeris message type
+    _EPHEM_CONSTELLATION = {
+        1019: "GPS",
+        1020: "GLONASS",
+        1042: "BeiDou",
+        1044: "QZSS",
+        1045: "Galileo F/NAV",
+        1046: "Galileo I/NAV",
+    }
+    # MSM7 constellation names, indexed by (msg_type - 1077) // 10 (1077, 1087, ... 1127)
+    _MSM7_CONSTELLATION = ("GPS", "GLONASS", "Galileo", "SBAS", "QZSS", "BeiDou")
+    
+    def __init__(self, debug_crc=False, on_message=_PRINT):
+        """
+        Args:
+            debug_crc: Dump frames that fail the CRC check
+            on_message: Callback(msg_type, msg_len, details) for each valid
+                message (default: print_message). Set to None to only count.
+        """
         self.buffer = bytearray()
+        self._head = 0  # Read cursor: bytes before it are already consumed
         self.msg_count = 0
         self.error_count = 0
         self.debug_crc = debug_crc
+        self.on_message = self.print_message if on_message is _PRINT else on_message
     
     def process(self, data):
         """
@@ -36,35 +170,44 @@ class RTCMDecoder:
         Args:
             data: bytes object containing RTCM data
         """
-        self.buffer.extend(data)
+        buf = self.buffer
+        buf.extend(data)
+        mv = memoryview(buf)
+        frame = None
+        head = self._head
         
         # Process all complete messages in buffer
-        while len(self.buffer) >= 3:
+        while len(buf) - head >= 3:
             # Look for RTCM3 preamble (0xD3)
-            if self.buffer[0] != 0xD3:
-                # Skip byte and continue searching
-                self.buffer = self.buffer[1:]
+            if buf[head] != 0xD3:
+                head = _find_preamble(buf, head, len(buf))
+                if head < 0:
+                    # No preamble at all: everything buffered is garbage
+                    head = len(buf)
+                    break
                 continue
             
             # Check if we have enough bytes to read header
-            if len(self.buffer) < 6:
+            if len(buf) - head < 6:
                 break
             
             # Parse message length (10 bits after reserved 6 bits)
-            msg_len = ((self.buffer[1] & 0x03) << 8) | self.buffer[2]
+            msg_len = ((buf[head + 1] & 0x03) << 8) | buf[head + 2]
             
             # Total frame length: 3 (header) + msg_len + 3 (CRC)
             frame_len = 3 + msg_len + 3
             
             # Wait for complete message
-            if len(self.buffer) < frame_len:
+            if len(buf) - head < frame_len:
                 break
             
-            # Extract complete frame
-            frame = self.buffer[:frame_len]
+            # View of the complete frame (no copy)
+            frame = mv[head:head + frame_len]
             
-            # Verify CRC24Q
-            if self._verify_crc(frame):
+            # Verify CRC24Q (last 3 bytes) over everything before it
+            end = head + frame_len
+            received_crc = (buf[end - 3] << 16) | (buf[end - 2] << 8) | buf[end - 1]
+            if received_crc == _crc24q_fast(frame, frame_len - 3):
                 self._decode_message(frame)
                 self.msg_count += 1
             else:
@@ -74,26 +217,18 @@ class RTCMDecoder:
                     print(f"[ERROR] CRC failed for message")
                 self.error_count += 1
             
-            # Remove processed frame from buffer
-            self.buffer = self.buffer[frame_len:]
-    
-    def _verify_crc(self, frame):
-        """
-        Verify RTCM3 CRC24Q
+            # Move past the processed frame
+            head += frame_len
         
-        Args:
-            frame: Complete RTCM frame including CRC
-            
-        Returns:
-            True if CRC is valid
-        """
-        # Extract CRC from last 3 bytes
-        received_crc = (frame[-3] << 16) | (frame[-2] << 8) | frame[-1]
-        
-        # Calculate CRC on everything except last 3 bytes
-        calculated_crc = self._crc24q(frame[:-3])
+        # Release the views before resizing the buffer
+        frame = mv = None
         
-        return received_crc == calculated_crc
+        # Drop consumed bytes once they make up a large part of the buffer
+        if head > _COMPACT_AT or head > len(buf) // 2:
+            # Slice assignment, not del: MicroPython's bytearray has no slice deletion
+            buf[:head] = b''
+            head = 0
+        self._head = head
     
     def _dump_failed_frame(self, frame):
         """
@@ -104,12 +239,11 @@ class RTCMDecoder:
         """
         # Extract message info
         msg_len = ((frame[1] & 0x03) << 8) | frame[2]
-        payload = frame[3:-3]
-        msg_type = (payload[0] << 4) | (payload[1] >> 4) if len(payload) >= 2 else 0
+        msg_type = (frame[3] << 4) | (frame[4] >> 4) if len(frame) >= 8 else 0
         
         # Get CRCs
         received_crc = (frame[-3] << 16) | (frame[-2] << 8) | frame[-1]
-        calculated_crc = self._crc24q(frame[:-3])
+        calculated_crc = self._crc24q(frame, len(frame) - 3)
         
         print(f"[ERROR] CRC failed for Type {msg_type} ({msg_len} bytes)")
         print(f"  Received CRC:   0x{received_crc:06X}")
@@ -119,93 +253,86 @@ class RTCMDecoder:
             print(f"  Frame (last 16 bytes):  {self._to_hex(frame[-16:])}")
     
     def _to_hex(self, data):
-        """Convert bytes to hex string"""
+        """Convert bytes (or a memoryview) to hex string"""
         return ' '.join(f'{b:02X}' for b in data)
     
-    def _crc24q(self, data):
+    def _crc24q(self, data, n=None):
         """
         Calculate CRC24Q (Qualcomm CRC-24)
         Polynomial: 0x1864CFB
+        
+        Args:
+            data: buffer to checksum
+            n: number of leading bytes to include (default: all)
         """
-        crc = 0
-        for byte in data:
-            crc ^= (byte << 16)
-            for _ in range(8):
-                crc <<= 1
-                if crc & 0x1000000:
-                    crc ^= 0x1864CFB
-        return crc & 0xFFFFFF
+        return _crc24q_fast(data, len(data) if n is None else n)
     
     def _decode_message(self, frame):
         """
-        Decode and display RTCM message information
+        Decode RTCM message information and pass it to on_message
         
         Args:
             frame: Complete validated RTCM frame
         """
-        # Extract message payload (skip 3-byte header, exclude 3-byte CRC)
-        payload = frame[3:-3]
+        on_message = self.on_message
+        if on_message is None:
+            return
         
-        # Message type is first 12 bits of payload
-        msg_type = (payload[0] << 4) | (payload[1] >> 4)
+        # Payload starts after the 3-byte header and excludes the 3-byte CRC;
+        # fields are read from frame directly so no slice is created
         
-        # Get message name
-        msg_name = self.MSG_TYPES.get(msg_type, "Unknown")
+        # Message type is first 12 bits of payload
+        msg_type = (frame[3] << 4) | (frame[4] >> 4)
         
         # Extract common fields based on message type
-        details = ""
-        
-        if msg_type in [1005, 1006]:
-            # Station position messages
-            station_id = ((payload[1] & 0x0F) << 8) | payload[2]
-            details = f"Station ID: {station_id}"
+        details = {}
         
-        elif 1001 <= msg_type <= 1004:
-            # GPS observables
-            station_id = ((payload[1] & 0x0F) << 8) | payload[2]
-            details = f"Station ID: {station_id}"
+        kind = self._MSG_KIND.get(msg_type)
         
-        elif 1009 <= msg_type <= 1012:
-            # GLONASS observables
-            station_id = ((payload[1] & 0x0F) << 8) | payload[2]
-            details = f"Station ID: {station_id}"
+        if kind == 'station':
+            # Station position and legacy observables
+            details['station_id'] = struct.unpack_from('>H', frame, 4)[0] & 0x0FFF
         
-        elif msg_type in [1019, 1020, 1042, 1044, 1045, 1046]:
+        elif kind == 'ephem':
             # Ephemeris messages
-            sat_id = (payload[1] & 0x0F) << 2 | (payload[2] >> 6)
-            constellation = {
-                1019: "GPS",
-                1020: "GLONASS", 
-                1042: "BeiDou",
-                1044: "QZSS",
-                1045: "Galileo F/NAV",
-                1046: "Galileo I/NAV"
-            }
-            details = f"Satellite: {constellation[msg_type]} {sat_id}"
-        
-        elif msg_type in [1077, 1087, 1097, 1107, 1117, 1127]:
+            details['sat_id'] = (struct.unpack_from('>H', frame, 4)[0] >> 6) & 0x3F
+            details['constellation'] = self._EPHEM_CONSTELLATION[msg_type]
+        
+        elif kind == 'msm7':
             # MSM7 messages (Multi-Signal Messages)
-            station_id = ((payload[1] & 0x0F) << 8) | payload[2]
-            constellation = {
-                1077: "GPS",
-                1087: "GLONASS",
-                1097: "Galileo",
-                1107: "SBAS",
-                1117: "QZSS",
-                1127: "BeiDou"
-            }
-            details = f"Station ID: {station_id}, {constellation[msg_type]}"
-        
-        # Display message info
-        msg_len = len(payload)
-        print(f"[{self.msg_count:04d}] Type {msg_type:4d}: {msg_name:40s} ({msg_len:3d} bytes) {details}")
+            details['station_id'] = struct.unpack_from('>H', frame, 4)[0] & 0x0FFF
+            details['constellation'] = self._MSM7_CONSTELLATION[(msg_type - 1077) // 10]
+        
+        on_message(msg_type, len(frame) - 6, details)
+    
+    def print_message(self, msg_type, msg_len, details):
+        """
+        Default on_message callback: display one line per message
+        
+        Args:
+            msg_type: RTCM message number
+            msg_len: Payload length in bytes
+            details: dict with station_id, or sat_id/constellation
+        """
+        msg_name = self.MSG_TYPES.get(msg_type, "Unknown")
+        
+        if 'sat_id' in details:
+            info = f"Satellite: {details['constellation']} {details['sat_id']}"
+        elif 'constellation' in details:
+            info = f"Station ID: {details['station_id']}, {details['constellation']}"
+        elif 'station_id' in details:
+            info = f"Station ID: {details['station_id']}"
+        else:
+            info = ""
+        
+        print(f"[{self.msg_count:04d}] Type {msg_type:4d}: {msg_name:40s} ({msg_len:3d} bytes) {info}")
     
     def get_stats(self):
         """Return decoder statistics"""
         return {
             'messages': self.msg_count,
             'errors': self.error_count,
-            'buffer_size': len(self.buffer)
+            'buffer_size': len(self.buffer) - self._head
         }
 
 
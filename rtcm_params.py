@@ -1,4 +1,5 @@
-RTCM_MESSAGES = [
+# Tuple (not list) so it can be frozen into flash as read-only data
+RTCM_MESSAGES = (
     # --- Reference Station Information ---
     ('RTCM1005', 30),  # Station coordinates (ARP, no height)
     ('RTCM1006', 30),  # Station coordinates (ARP + height)
@@ -19,7 +20,7 @@ RTCM_MESSAGES = [
     ('RTCM1107', 1),   # SBAS MSM7 (optional, low impact)
     ('RTCM1117', 1),   # QZSS MSM7
     ('RTCM1127', 1),   # BeiDou MSM7
-]
+)
 """
     # --- State Space Representation (SSR) Corrections ---
     # GPS SSR (1057–1062)
@@ -1,11 +1,42 @@
 from machine import Pin, UART
 import time
+import uselect as select
 import rtcm_decoder
 from rtcm_params import RTCM_MESSAGES
 import gc
+import micropython
+from micropython import const
 from machine import WDT
 wdt = WDT(timeout=8000)
 
+# Per-command "Sent"/"Response" prints (set to 0 for production builds)
+_DBG = const(1)
+
+@micropython.viper
+def _xor8(data: ptr8, n: int) -> int:
+    """XOR of the first n bytes of data (native code)"""
+    cs = 0
+    for i in range(n):
+        cs ^= data[i]
+    return cs
+
+def uart_poller(uart):
+    """
+    Poll object that wakes up on UART data instead of polling on a fixed sleep
+
+    Args:
+        uart: UART to watch for incoming data
+
+    Returns:
+        select.poll object, or None if this port cannot poll a UART
+    """
+    try:
+        poller = select.poll()
+        poller.register(uart, select.POLLIN)
+        return poller
+    except (AttributeError, TypeError, OSError):
+        return None
+
 class UM980Config:
         
     def __init__(self, uart_id=0, tx_pin=0, rx_pin=1, baudrate=115200, en_pin=6, data_uart_id=None, data_tx_pin=None, data_rx_pin=None):
@@ -25,6 +56,11 @@ class UM980Config:
         # RTCM Decoder
         self.decoder = rtcm_decoder.RTCMDecoder()
         
+        # Commands with checksum, by command text (they repeat on every reconfiguration)
+        self._cmd_cache = {}
+        # Queries with CRLF, by query text
+        self._query_cache = {}
+        
         # Initialize data UART (COM2) if specified
         self.data_uart = None
         if data_uart_id is not None and data_tx_pin is not None and data_rx_pin is not None:
@@ -33,14 +69,24 @@ class UM980Config:
         
     def _xor8_checksum(self, data):
         """Calculate XOR checksum"""
-        checksum = 0
-        for char in data:
-            checksum ^= ord(char)
-        return '{:02X}'.format(checksum & 0xFF)
+        data = data.encode()
+        return '%02X' % _xor8(data, len(data))
     
     def _cmd_with_checksum(self, cmd):
-        """Add $ prefix and checksum"""
-        return f'${cmd}*{self._xor8_checksum(cmd)}'
+        """Add $ prefix, checksum and CRLF; returns bytes ready to write (cached per command)"""
+        cmd_bytes = self._cmd_cache.get(cmd)
+        if cmd_bytes is None:
+            cmd_bytes = b'$' + cmd.encode() + b'*' + self._xor8_checksum(cmd).encode() + b'\r\n'
+            self._cmd_cache[cmd] = cmd_bytes
+        return cmd_bytes
+
+    def _query_bytes(self, cmd):
+        """Add CRLF to a query; returns bytes ready to write (cached per query)"""
+        cmd_bytes = self._query_cache.get(cmd)
+        if cmd_bytes is None:
+            cmd_bytes = cmd.encode() + b'\r\n'
+            self._query_cache[cmd] = cmd_bytes
+        return cmd_bytes
 
     def _clear_buffer(self):
         # Clear buffer safely with size limit
@@ -59,31 +105,34 @@ class UM980Config:
         """
         self._clear_buffer()
         
-        self.uart.write(cmd.encode() + b'\r\n')
-        print(f"Sent: {cmd}")
+        self.uart.write(self._query_bytes(cmd))
+        if _DBG:
+            print(f"Sent: {cmd}")
         
         start = time.ticks_ms()
-        response = b''
+        response = bytearray()
         last_data_time = None
         max_response_size = 4096
         
         while time.ticks_diff(time.ticks_ms(), start) < timeout * 1000 and len(response) < max_response_size:
-            if self.uart.any():
-                chunk = self.uart.read(self.uart.any())
+            n = self.uart.any()
+            if n:
+                chunk = self.uart.read(n)
                 if chunk:
-                    response += chunk
+                    response.extend(chunk)
                     last_data_time = time.ticks_ms()
             
             if response and last_data_time is not None:
                 if time.ticks_diff(time.ticks_ms(), last_data_time) > 500:
-                    resp_str = response.decode('utf-8', 'ignore')
-                    print(f"Response: {len(response)} bytes, {resp_str.count(chr(10))} lines")
+                    resp_str = bytes(response).decode('utf-8', 'ignore')
+                    if _DBG:
+                        print(f"Response: {len(response)} bytes, {resp_str.count(chr(10))} lines")
                     return resp_str
             
             time.sleep(0.01)
         
         if response:
-            return response.decode('utf-8', 'ignore')
+            return bytes(response).decode('utf-8', 'ignore')
         print("No response received")
         return None
 
@@ -92,37 +141,40 @@ class UM980Config:
         Send configuration command (with checksum and $)
         Used for: CONFIG xxx, MODE BASE, RTCM messages, SAVECONFIG, etc.
         """
-        cmd_with_cs = self._cmd_with_checksum(cmd)
+        cmd_bytes = self._cmd_with_checksum(cmd)
 
         self._clear_buffer()
         
-        self.uart.write(cmd_with_cs.encode() + b'\r\n')
-        print(f"Sent: {cmd_with_cs}")
+        self.uart.write(cmd_bytes)
+        if _DBG:
+            print(f"Sent: {cmd_bytes[:-2].decode()}")
         
         start = time.ticks_ms()
-        response = b''
+        response = bytearray()
         last_data_time = None
         
         while time.ticks_diff(time.ticks_ms(), start) < timeout * 1000:
-            if self.uart.any():
-                chunk = self.uart.read(self.uart.any())
+            n = self.uart.any()
+            if n:
+                chunk = self.uart.read(n)
                 if chunk:
-                    response += chunk
+                    response.extend(chunk)
                     last_data_time = time.ticks_ms()
             
             if response and last_data_time is not None:
                 if time.ticks_diff(time.ticks_ms(), last_data_time) > 500:
-                    resp_str = response.decode('utf-8', 'ignore')
-                    if 'OK' in resp_str:
-                        print(f"Response: OK")
-                    else:
-                        print(f"Response: {len(response)} bytes")
+                    resp_str = bytes(response).decode('utf-8', 'ignore')
+                    if _DBG:
+                        if 'OK' in resp_str:
+                            print(f"Response: OK")
+                        else:
+                            print(f"Response: {len(response)} bytes")
                     return resp_str
             
             time.sleep(0.01)
         
         if response:
-            return response.decode('utf-8', 'ignore')
+            return bytes(response).decode('utf-8', 'ignore')
         print("No response received")
         return None
 
@@ -317,7 +369,9 @@ class UM980Config:
         print(f"\n=== Reading RTCM Data from COM2 ===")
         
         total_bytes = 0
-        start_time = time.ticks_ms()
+        deadline = time.ticks_add(time.ticks_ms(), int(duration * 1000))
+        
+        poller = uart_poller(self.data_uart)
         
         try:
             while True:
@@ -327,19 +381,24 @@ class UM980Config:
                 if bytes_available > 0:
                     data = self.data_uart.read(min(bytes_available,2048))
                     if data:
+                        total_bytes += len(data)
                         if callback:
                             callback(data)
                         else:
                             print(f"Received {len(data)} bytes")
                 
                 # Check timeout
+                wait_ms = 1000
                 if duration > 0:
-                    elapsed = time.ticks_diff(time.ticks_ms(), start_time) / 1000
-                    if elapsed >= duration:
+                    wait_ms = min(wait_ms, time.ticks_diff(deadline, time.ticks_ms()))
+                    if wait_ms <= 0:
                         break
                 
-                # Small sleep to prevent busy-waiting
-                time.sleep_ms(20)
+                # Wait for more data
+                if poller:
+                    poller.poll(wait_ms)
+                else:
+                    time.sleep_ms(20)
         
         except KeyboardInterrupt:
             print("\nStopped by user")
@@ -385,15 +444,15 @@ class UM980Config:
                 for line in resp_str.split('\n'):
                     if '#AGCA' in line:
                         try:
-                            # Split by semicolon to get the values section
-                            values_part = line.split(';')[-1].split('*')[0]
-                            values_list = [int(x.strip()) for x in values_part.split(',')]
+                            # Values section is after the last semicolon, before the CRC
+                            values_part = line.rpartition(';')[2].partition('*')[0]
+                            # Only the first 3 values (L1, L2, L5) are needed
+                            values_list = values_part.split(',', 3)
                             
-                            # Extract first 3 values (L1, L2, L5)
                             agc_values = {
-                                'L1': values_list[0],
-                                'L2': values_list[1],
-                                'L5': values_list[2]
+                                'L1': int(values_list[0]),
+                                'L2': int(values_list[1]),
+                                'L5': int(values_list[2])
                             }
                             
                             print(f"L1: {agc_values['L1']}, L2: {agc_values['L2']}, L5: {agc_values['L5']}")
@@ -1,98 +1,241 @@
-import network
-import time
-try:
-    from machine import Pin, WIZNET_PIO_SPI
-except ImportError:
-    WIZNET_PIO_SPI = None
-    Pin = None
+import micropython
+import ubinascii as binascii
+
+# network, time and machine are imported on first use so that importing this
+# module stays cheap on boots that never bring Ethernet up
+Pin = None
+WIZNET_PIO_SPI = None
+_machine_loaded = False
+
+def _load_machine():
+    global Pin, WIZNET_PIO_SPI, _machine_loaded
+    try:
+        from machine import Pin, WIZNET_PIO_SPI
+    except ImportError:
+        pass
+    _machine_loaded = True
 
 _DEFAULTS = {
     # Auto-construct boards (no explicit PIO SPI)
-    "w5100s-evb-pico":  {},
-    "w5500-evb-pico":   {},
-    "w6100-evb-pico":   {},
-    "w5100s-evb-pico2": {},
-    "w5500-evb-pico2":  {},
-    "w6100-evb-pico2":  {},
+    "w5100s-evb-pico":  {"_class": "auto"},
+    "w5500-evb-pico":   {"_class": "auto"},
+    "w6100-evb-pico":   {"_class": "auto"},
+    "w5100s-evb-pico2": {"_class": "auto"},
+    "w5500-evb-pico2":  {"_class": "auto"},
+    "w6100-evb-pico2":  {"_class": "auto"},
 
     # W55RP20 — single SPI (PIO SPI)
-    "w55rp20-evb-pico": {"baudrate": 31250000, "sck": 21, "cs": 20, "mosi": 23, "miso": 22, "reset": 25},
+    "w55rp20-evb-pico": {"_class": "single", "baudrate": 31250000, "sck": 21, "cs": 20, "mosi": 23, "miso": 22, "reset": 25},
 
     # W6300 — QSPI QUAD(io0..io3)
-    "w6300-evb-pico":  {"baudrate": 31250000, "sck": 17, "cs": 16, "io0": 18, "io1": 19, "io2": 20, "io3": 21, "reset": 22},
-    "w6300-evb-pico2": {"baudrate": 31250000, "sck": 17, "cs": 16, "io0": 18, "io1": 19, "io2": 20, "io3": 21, "reset": 22},
+    "w6300-evb-pico":  {"_class": "qspi", "baudrate": 31250000, "sck": 17, "cs": 16, "io0": 18, "io1": 19, "io2": 20, "io3": 21, "reset": 22},
+    "w6300-evb-pico2": {"_class": "qspi", "baudrate": 31250000, "sck": 17, "cs": 16, "io0": 18, "io1": 19, "io2": 20, "io3": 21, "reset": 22},
 }
-_AUTO = {
-    "w5100s-evb-pico", "w5500-evb-pico", "w6100-evb-pico",
-    "w5100s-evb-pico2","w5500-evb-pico2","w6100-evb-pico2",
-}
-_SINGLE = {"w55rp20-evb-pico"}   # PIO single-SPI
-_QSPI   = {"w6300-evb-pico", "w6300-evb-pico2"}
 
-def _pin(x): return x if isinstance(x, Pin) else Pin(x)
+# Whether this port's WIZNET6K has active(); fixed per class, so probed once (on the first wiznet() call)
+_HAS_ACTIVE = None
+
+# Pins each PIO-SPI board class must resolve
+_REQ_SINGLE = ("sck", "cs", "mosi", "miso", "reset")
+_REQ_QSPI   = ("sck", "cs", "io0", "io1", "io2", "io3")
+
+# Pin objects by pin number, built once and reused across wiznet() calls
+_PIN_CACHE = {}
+
+def _get_pin(x):
+    p = _PIN_CACHE.get(x)
+    if p is None:
+        p = x if isinstance(x, Pin) else Pin(x)
+        _PIN_CACHE[x] = p
+    return p
+
+def _lookup(kw, defaults, key, default=None):
+    # Caller's override first, then the board default - no per-call dict copy
+    return kw[key] if key in kw else defaults.get(key, default)
+
+# PIO SPI objects by their full parameter tuple; reusing one skips reloading the PIO program
+_SPI_CACHE = {}
+
+def _require_pio():
+    if not _machine_loaded:
+        _load_machine()
+    if WIZNET_PIO_SPI is None or Pin is None:
+        raise RuntimeError("WIZNET_PIO_SPI/Pin not available on this port")
+
+# PIO builders return (spi, cs, reset); "auto" boards are constructed inline in wiznet()
+def _build_single(defaults, kw):
+    _require_pio()
+    for k in _REQ_SINGLE:
+        if k not in kw and k not in defaults: raise ValueError("Missing pin '{}' for W55RP20 single-SPI".format(k))
+    cs = _lookup(kw, defaults, "cs")
+    cs_pin = _get_pin(cs)
+    reset_pin = _get_pin(_lookup(kw, defaults, "reset"))
+    sig = ("single", _lookup(kw, defaults, "baudrate", 31250000), _lookup(kw, defaults, "sck"),
+           cs, _lookup(kw, defaults, "mosi"), _lookup(kw, defaults, "miso"))
+    spi = _SPI_CACHE.get(sig)
+    if spi is None:
+        spi = WIZNET_PIO_SPI(
+            baudrate=sig[1], sck=_get_pin(sig[2]), cs=cs_pin,
+            mosi=_get_pin(sig[4]), miso=_get_pin(sig[5]),
+        )
+        _SPI_CACHE[sig] = spi
+    return spi, cs_pin, reset_pin
+
+def _build_qspi(defaults, kw):
+    _require_pio()
+    for k in _REQ_QSPI:
+        if k not in kw and k not in defaults: raise ValueError("Missing pin '{}' for W6300 QSPI".format(k))
+    cs = _lookup(kw, defaults, "cs")
+    cs_pin = _get_pin(cs)
+    reset_pin = _get_pin(_lookup(kw, defaults, "reset", cs))
+    sig = ("qspi", _lookup(kw, defaults, "baudrate", 31250000), _lookup(kw, defaults, "sck"), cs,
+           _lookup(kw, defaults, "io0"), _lookup(kw, defaults, "io1"),
+           _lookup(kw, defaults, "io2"), _lookup(kw, defaults, "io3"))
+    spi = _SPI_CACHE.get(sig)
+    if spi is None:
+        spi = WIZNET_PIO_SPI(
+            baudrate=sig[1], sck=_get_pin(sig[2]), cs=cs_pin,
+            io0=_get_pin(sig[4]), io1=_get_pin(sig[5]),
+            io2=_get_pin(sig[6]), io3=_get_pin(sig[7]),
+        )
+        _SPI_CACHE[sig] = spi
+    return spi, cs_pin, reset_pin
+
+# Builder per PIO board class ("_class" in _DEFAULTS)
+_BUILDERS = {"single": _build_single, "qspi": _build_qspi}
+
+# Static (ip, sn, gw, dns) tuples already checked by _check_static()
+_STATIC_OK = set()
+
+def _check_static(cfg):
+    # Reject malformed dotted quads here instead of deep inside the driver
+    if cfg not in _STATIC_OK:
+        for addr in cfg:
+            parts = addr.split(".")
+            if len(parts) != 4 or not all(p.isdigit() and int(p) < 256 for p in parts):
+                raise ValueError("Invalid IPv4 address: {}".format(addr))
+        _STATIC_OK.add(cfg)
+    return cfg
+
+# Caller's board spelling -> normalised key; only supported boards are stored, so it stays small
+_BOARD_NORM = {}
 
-def wiznet(board, *, dhcp=True, spi=None, cs=None, reset=None, **kw):
-    board = board.strip().lower()
-    if board not in _DEFAULTS:
+def _norm(b):
+    r = _BOARD_NORM.get(b)
+    if r is None:
+        r = b.strip().lower()
+        if r in _DEFAULTS:
+            _BOARD_NORM[b] = r
+    return r
+
+# Brought-up NICs by (board, dhcp, kwargs), so a repeated wiznet() call reuses a live link
+_NIC_CACHE = {}
+
+# Boot-time glue: the MicroPython compiler emits it as native machine code
+@micropython.native
+def wiznet(board, *, dhcp=True, spi=None, cs=None, reset=None, dhcp_timeout=15.0, poll_ms=50, force=False, **kw):
+    board = _norm(board)
+    defaults = _DEFAULTS.get(board)
+    if defaults is None:
         raise ValueError("Unsupported board: {}".format(board))
-    cfg = _DEFAULTS[board].copy()
-    cfg.update(kw)
-    
-    # Manual override path: if spi is provided, use it directly
-    if spi is not None:
-        if cs is None or reset is None:
-            raise ValueError("When passing custom spi, also pass cs and reset")
-        nic = network.WIZNET6K(spi, cs, reset)
-    else:
-        if board in _AUTO:
-            nic = network.WIZNET6K()
-
-        elif board in _SINGLE:
-            if WIZNET_PIO_SPI is None or Pin is None:
-                raise RuntimeError("WIZNET_PIO_SPI/Pin not available on this port")
-            required = ["sck", "cs", "mosi", "miso", "reset"]
-            missing = [k for k in required if k not in cfg]
-            if missing:
-                raise ValueError("Missing pins for W55RP20 single-SPI: " + ", ".join(missing))
-            spi = WIZNET_PIO_SPI(
-                baudrate=cfg.get("baudrate", 31250000),
-                sck=_pin(cfg["sck"]), cs=_pin(cfg["cs"]),
-                mosi=_pin(cfg["mosi"]), miso=_pin(cfg["miso"]),
-            )
-            nic = network.WIZNET6K(spi, _pin(cfg["cs"]), _pin(cfg["reset"]))
-
-        elif board in _QSPI:
-            if WIZNET_PIO_SPI is None or Pin is None:
-                raise RuntimeError("WIZNET_PIO_SPI/Pin not available on this port")
-            for k in ["sck","cs","io0","io1","io2","io3"]:
-                if k not in cfg: raise ValueError("Missing pin '{}' for W6300 QSPI".format(k))
-            spi = WIZNET_PIO_SPI(
-                baudrate=cfg.get("baudrate", 31250000),
-                sck=_pin(cfg["sck"]), cs=_pin(cfg["cs"]),
-                io0=_pin(cfg["io0"]), io1=_pin(cfg["io1"]),
-                io2=_pin(cfg["io2"]), io3=_pin(cfg["io3"]),
-            )
-            nic = network.WIZNET6K(spi, _pin(cfg["cs"]), _pin(cfg.get("reset", cfg["cs"])))
 
+    # A caller-supplied spi object is never cached
+    key = (board, dhcp, tuple(sorted(kw.items())) if kw else ()) if spi is None else None
+    if key is not None and not force:
+        nic = _NIC_CACHE.get(key)
+        if nic is not None and nic.isconnected():
+            return nic
+
+    # Validate the static addresses before touching the hardware
+    if not dhcp:
+        ip = kw.get("ip"); sn = kw.get("sn"); gw = kw.get("gw"); dns = kw.get("dns", gw or "8.8.8.8")
+        if not (ip and sn and gw): raise ValueError("Static mode requires ip/sn/gw")
+        static = _check_static((ip, sn, gw, dns))
+
+    global _HAS_ACTIVE
+    import network
+    import time
+
+    # Resolve module attributes once; the wait loop below uses the locals
+    WIZNET6K = network.WIZNET6K
+    sleep_ms = time.sleep_ms
+    ticks_ms = time.ticks_ms
+    ticks_diff = time.ticks_diff
+
+    if spi is None and defaults["_class"] == "auto":
+        # Common case: the port wires up the on-board chip itself, no pin work needed
+        nic = WIZNET6K()
+    else:
+        # Manual override path: if spi is provided, use it directly
+        if spi is not None:
+            if cs is None or reset is None:
+                raise ValueError("When passing custom spi, also pass cs and reset")
         else:
-            raise ValueError("Unexpected board mapping")
+            spi, cs, reset = _BUILDERS[defaults["_class"]](defaults, kw)
+        nic = WIZNET6K(spi, cs, reset)
 
     # Bring up (if supported)
-    try: nic.active(True)
-    except AttributeError: pass
+    if _HAS_ACTIVE is None:
+        _HAS_ACTIVE = hasattr(WIZNET6K, "active")
+    if _HAS_ACTIVE:
+        nic.active(True)
 
     if dhcp:
-        try: nic.ifconfig("dhcp")
-        except Exception: pass
+        # Already holding a lease (port started DHCP itself, or it survived): don't renegotiate.
+        # isconnected() alone only means link up on the chip's own TCP/IP stack, so check the address.
+        if not (nic.isconnected() and nic.ifconfig()[0] != "0.0.0.0"):
+            try: nic.ifconfig("dhcp")
+            except Exception: pass
     else:
-        ip = cfg.get("ip"); sn = cfg.get("sn"); gw = cfg.get("gw"); dns = cfg.get("dns", gw or "8.8.8.8")
-        if not (ip and sn and gw): raise ValueError("Static mode requires ip/sn/gw")
-        nic.ifconfig((ip, sn, gw, dns))
+        nic.ifconfig(static)
+
+    # Wait for link/lease: poll fast at first, back off to 500 ms, give up after dhcp_timeout
+    deadline = time.ticks_add(ticks_ms(), int(dhcp_timeout * 1000))
+    delay = poll_ms
+    polls = 0
     while not nic.isconnected():
-        print("Waiting for the network to connect...")
-        time.sleep(1)
+        if ticks_diff(deadline, ticks_ms()) <= 0:
+            raise OSError("DHCP timeout" if dhcp else "Network connect timeout")
+        if polls % 4 == 0:
+            print("Waiting for the network to connect...")
+        polls += 1
+        sleep_ms(delay)
+        delay = min(delay * 2, 500)
 
-    print("MAC Address:", ":".join("%02x" % b for b in nic.config("mac")))
-    print("IP Address:", nic.ifconfig())
+    mac = nic.config("mac")
+    try:
+        print("MAC Address:", binascii.hexlify(mac, ":").decode())
+    except TypeError:
+        # Port's hexlify has no separator argument
+        print("MAC Address:", ":".join("%02x" % b for b in mac))
+    print("IP Address:", wiznet_status(nic, 0))
+    if key is not None:
+        _NIC_CACHE[key] = nic
     return nic
 
+# Last ifconfig() result, for wiznet_status()
+_status_nic = None
+_status_cfg = None
+_status_time = 0
+
+def wiznet_status(nic, max_age_ms=1000):
+    """
+    Return nic.ifconfig(), reusing the previous result for up to max_age_ms
+
+    Args:
+        nic: Interface returned by wiznet()
+        max_age_ms: How old a cached result may be (0 always queries the driver)
+
+    Returns:
+        (ip, subnet, gateway, dns) tuple
+    """
+    global _status_nic, _status_cfg, _status_time
+    import time
+    now = time.ticks_ms()
+    # A different NIC invalidates the cached addresses; link state is the caller's to check
+    if nic is not _status_nic or time.ticks_diff(now, _status_time) >= max_age_ms:
+        _status_cfg = nic.ifconfig()
+        _status_nic = nic
+        _status_time = now
+    return _status_cfg
+